@@ -1,4 +1,5 @@
 from microsoft_agents.copilotstudio.client.errors import copilot_studio_errors
+from functools import lru_cache
 from urllib.parse import urlparse, urlunparse
 from typing import Optional
 from .connection_settings import ConnectionSettings
@@ -22,34 +23,62 @@ class PowerPlatformEnvironment:
         cloud: PowerPlatformCloud = PowerPlatformCloud.PROD,
         cloud_base_address: Optional[str] = None,
     ) -> str:
+        return PowerPlatformEnvironment._get_copilot_studio_connection_url(
+            settings.environment_id,
+            settings.agent_identifier,
+            settings.cloud,
+            settings.copilot_agent_type,
+            settings.custom_power_platform_cloud,
+            conversation_id,
+            agent_type,
+            cloud,
+            cloud_base_address,
+        )
+
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _get_copilot_studio_connection_url(
+        environment_id: str,
+        agent_identifier: str,
+        settings_cloud: Optional[PowerPlatformCloud],
+        settings_agent_type: Optional[AgentType],
+        custom_power_platform_cloud: Optional[str],
+        conversation_id: Optional[str],
+        agent_type: AgentType,
+        cloud: PowerPlatformCloud,
+        cloud_base_address: Optional[str],
+    ) -> str:
+        # The URL is a pure function of these values, so it is cached by value
+        # rather than by settings instance. The conversation id is part of the
+        # key, so hits only come from requests within the same conversation.
         if cloud == PowerPlatformCloud.OTHER and not cloud_base_address:
             raise ValueError(str(copilot_studio_errors.CloudBaseAddressRequired))
-        if not settings.environment_id:
+        if not environment_id:
             raise ValueError(str(copilot_studio_errors.EnvironmentIdRequired))
-        if not settings.agent_identifier:
+        if not agent_identifier:
             raise ValueError(str(copilot_studio_errors.AgentIdentifierRequired))
-        if settings.cloud and settings.cloud != PowerPlatformCloud.UNKNOWN:
-            cloud = settings.cloud
+        if settings_cloud and settings_cloud != PowerPlatformCloud.UNKNOWN:
+            cloud = settings_cloud
         if cloud == PowerPlatformCloud.OTHER:
             parsed_url = urlparse(cloud_base_address)
             is_absolute_url = parsed_url.scheme and parsed_url.netloc
             if cloud_base_address and is_absolute_url:
                 pass
-            elif settings.custom_power_platform_cloud:
-                cloud_base_address = settings.custom_power_platform_cloud
+            elif custom_power_platform_cloud:
+                cloud_base_address = custom_power_platform_cloud
             else:
                 raise ValueError(
                     str(copilot_studio_errors.CustomCloudOrBaseAddressRequired)
                 )
-        if settings.copilot_agent_type:
-            agent_type = settings.copilot_agent_type
+        if settings_agent_type:
+            agent_type = settings_agent_type
 
         cloud_base_address = cloud_base_address or "api.unknown.powerplatform.com"
         host = PowerPlatformEnvironment.get_environment_endpoint(
-            cloud, settings.environment_id, cloud_base_address
+            cloud, environment_id, cloud_base_address
         )
         return PowerPlatformEnvironment.create_uri(
-            settings.agent_identifier, host, agent_type, conversation_id
+            agent_identifier, host, agent_type, conversation_id
         )
 
     @staticmethod
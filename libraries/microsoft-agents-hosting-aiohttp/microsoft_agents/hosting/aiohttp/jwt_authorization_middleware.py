@@ -11,7 +11,7 @@ from microsoft_agents.hosting.core.authorization import (
 async def jwt_authorization_middleware(request: Request, handler):
 
     auth_config: AgentAuthConfiguration = request.app["agent_configuration"]
-    token_validator = JwtTokenValidator(auth_config)
+    token_validator = JwtTokenValidator.for_configuration(auth_config)
     auth_header = request.headers.get("Authorization")
 
     if auth_header:
@@ -39,7 +39,7 @@ def jwt_authorization_decorator(func):
     @functools.wraps(func)
     async def wrapper(request):
         auth_config: AgentAuthConfiguration = request.app["agent_configuration"]
-        token_validator = JwtTokenValidator(auth_config)
+        token_validator = JwtTokenValidator.for_configuration(auth_config)
         auth_header = request.headers.get("Authorization")
         if auth_header:
             # Extract the token from the Authorization header
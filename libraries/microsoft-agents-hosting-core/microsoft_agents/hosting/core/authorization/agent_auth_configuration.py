@@ -20,6 +20,9 @@ class AgentAuthConfiguration:
     SCOPES: The scopes to request
     AUTHORITY: The authority URL for the Azure AD (if different from the default).f
     ALT_BLUEPRINT_ID: An optional alternative blueprint ID used when constructing a connector client.
+    ISSUER_TO_JWKS_URI: An optional mapping of token issuer to the JWKS URI used to validate its tokens.
+        Issuers missing from the mapping use the tenant JWKS URI. With a single entry, the tokens of
+        every issuer are validated against its JWKS URI.
     """
 
     TENANT_ID: Optional[str]
@@ -32,6 +35,7 @@ class AgentAuthConfiguration:
     SCOPES: Optional[list[str]]
     AUTHORITY: Optional[str]
     ALT_BLUEPRINT_ID: Optional[str]
+    ISSUER_TO_JWKS_URI: Optional[dict[str, str]]
 
     def __init__(
         self,
@@ -44,6 +48,7 @@ class AgentAuthConfiguration:
         connection_name: Optional[str] = None,
         authority: Optional[str] = None,
         scopes: Optional[list[str]] = None,
+        issuer_to_jwks_uri: Optional[dict[str, str]] = None,
         **kwargs: Optional[dict[str, str]],
     ):
 
@@ -57,6 +62,9 @@ class AgentAuthConfiguration:
         self.CONNECTION_NAME = connection_name or kwargs.get("CONNECTIONNAME", None)
         self.SCOPES = scopes or kwargs.get("SCOPES", None)
         self.ALT_BLUEPRINT_ID = kwargs.get("ALT_BLUEPRINT_NAME", None)
+        self.ISSUER_TO_JWKS_URI = issuer_to_jwks_uri or kwargs.get(
+            "ISSUERTOJWKSURI", None
+        )
 
     @property
     def ISSUERS(self) -> list[str]:
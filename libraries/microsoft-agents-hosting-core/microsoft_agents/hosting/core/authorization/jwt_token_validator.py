@@ -2,10 +2,19 @@
 # Licensed under the MIT License.
 
 import asyncio
+import base64
+import binascii
+import hashlib
+import json
 import logging
+import time
+import weakref
 import jwt
 
-from jwt import PyJWKClient, PyJWK, decode, get_unverified_header
+from collections import OrderedDict
+from typing import Optional
+
+from jwt import PyJWKClient, PyJWK, PyJWKSet
 
 from .agent_auth_configuration import AgentAuthConfiguration
 from .claims_identity import ClaimsIdentity
@@ -13,44 +22,298 @@ from .claims_identity import ClaimsIdentity
 logger = logging.getLogger(__name__)
 
 
+class _LRU(OrderedDict):
+    """An OrderedDict that evicts its least recently used entry beyond maxsize."""
+
+    def __init__(self, maxsize: int):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def get(self, key, default=None):
+        try:
+            self.move_to_end(key)
+        except KeyError:
+            return default
+        return self[key]
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        if len(self) > self.maxsize:
+            self.popitem(last=False)
+
+
 class JwtTokenValidator:
+    # PyJWKClient instances are shared across validators so that the signing
+    # keys they cache survive beyond a single request.
+    _jwks_clients: dict[str, PyJWKClient] = {}
+    # Validators shared by the hosting middleware, one per configuration, so
+    # that their caches outlive a single request. Entries go away with their
+    # configuration.
+    _validators: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    _CLAIMS_CACHE_MAX = 10_000
+    _CLAIMS_CACHE_TTL = 5.0
+
+    _KEY_CACHE_TTL = 3600.0
+    _KEY_CACHE_MAX = 64
+    # Keys this close to expiry are still served, but refreshed in the
+    # background so that requests do not block on the JWKS endpoint.
+    _KEY_REFRESH_AHEAD = 300.0
+    # After a failed background refresh, wait this long before trying again.
+    _KEY_REFRESH_RETRY = 30.0
+
+    _BOT_FRAMEWORK_ISSUER = "https://api.botframework.com"
+    _BOT_FRAMEWORK_JWKS_URI = "https://login.botframework.com/v1/.well-known/keys"
+
     def __init__(self, configuration: AgentAuthConfiguration):
         self.configuration = configuration
 
+        # The hosting middleware also builds validators without a configuration
+        # to hand out anonymous claims.
+        self._client_id = configuration.CLIENT_ID if configuration else None
+        tenant_id = configuration.TENANT_ID if configuration else None
+        issuer_to_jwks_uri = configuration.ISSUER_TO_JWKS_URI if configuration else None
+        self._tenant_jwks_uri = (
+            f"https://login.microsoftonline.com/{tenant_id}/discovery/v2.0/keys"
+        )
+        self._issuer_to_jwks_uri = issuer_to_jwks_uri or {
+            self._BOT_FRAMEWORK_ISSUER: self._BOT_FRAMEWORK_JWKS_URI
+        }
+        # A single configured JWKS URI validates the tokens of every issuer
+        # (see AgentAuthConfiguration), so the unverified payload does not
+        # need to be decoded.
+        self._jwks_uri = (
+            next(iter(issuer_to_jwks_uri.values()))
+            if issuer_to_jwks_uri and len(issuer_to_jwks_uri) == 1
+            else None
+        )
+        # Claims cache keys are blake2b digests of the audience followed by the
+        # token; the audience prefix is hashed once here and copied per token.
+        self._claims_cache_digest = hashlib.blake2b(
+            f"{self._client_id}\0".encode(), digest_size=16
+        )
+
+        # Caches are per validator so that validators for different tenants
+        # neither share kids nor serialize on one another's JWKS fetches.
+        # Claims of recently validated tokens let repeated presentations skip
+        # signature verification; values are (claims, expires_at).
+        self._claims_cache: dict[bytes, tuple[dict, float]] = {}
+        # Signing keys keyed by (jwks_uri, kid); values are (key, inserted_at),
+        # so each kid expires on its own. Bounded so that kids rotated out over
+        # the life of the process are dropped. All times are time.monotonic().
+        self._key_cache = _LRU(self._KEY_CACHE_MAX)
+        self._lock = asyncio.Lock()
+        self._refreshing: set[tuple[str, str]] = set()
+        self._refresh_failed_at: dict[tuple[str, str], float] = {}
+        self._refresh_tasks: set[asyncio.Task] = set()
+
+    @classmethod
+    def for_configuration(
+        cls, configuration: AgentAuthConfiguration
+    ) -> "JwtTokenValidator":
+        """Returns the validator shared by all requests for a configuration."""
+        if not configuration:
+            return cls(configuration)
+        validator = cls._validators.get(configuration)
+        if validator is None:
+            # The validator only holds a proxy to its configuration, otherwise
+            # the value would keep its own weak key alive.
+            validator = cls._validators.setdefault(
+                configuration, cls(weakref.proxy(configuration))
+            )
+        return validator
+
     async def validate_token(self, token: str) -> ClaimsIdentity:
 
         logger.debug("Validating JWT token.")
+        cache_key = self._get_claims_cache_key(token)
+        cached = self._claims_cache.get(cache_key)
+        if cached is not None:
+            claims, expires_at = cached
+            if expires_at > time.monotonic():
+                logger.debug("JWT token validated from cache.")
+                return ClaimsIdentity(dict(claims), True)
+            self._claims_cache.pop(cache_key, None)
+
         key = await self._get_public_key_or_secret(token)
-        decoded_token = jwt.decode(
-            token,
-            key=key,
-            algorithms=["RS256"],
-            leeway=300.0,
-            options={"verify_aud": False},
-        )
-        if decoded_token["aud"] != self.configuration.CLIENT_ID:
-            logger.error(f"Invalid audience: {decoded_token['aud']}", stack_info=True)
-            raise ValueError("Invalid audience.")
+        try:
+            decoded_token = jwt.decode(
+                token,
+                key=key,
+                algorithms=["RS256"],
+                leeway=300.0,
+                audience=self._client_id,
+                # Without a client ID PyJWT would accept tokens lacking aud.
+                options={"require": ["aud"]},
+            )
+        except jwt.InvalidAudienceError as e:
+            # The signature has been verified by now, so the payload is trusted.
+            audience = self._decode_segment(token.split(".", 2)[1]).get("aud")
+            logger.error(f"Invalid audience: {audience}", stack_info=True)
+            raise ValueError("Invalid audience.") from e
+        except jwt.MissingRequiredClaimError as e:
+            logger.error("Invalid audience: token has no aud claim.", stack_info=True)
+            raise ValueError("Invalid audience.") from e
+
+        self._cache_claims(cache_key, decoded_token)
 
         # This probably should return a ClaimsIdentity
         logger.debug("JWT token validated successfully.")
-        return ClaimsIdentity(decoded_token, True)
+        return ClaimsIdentity(dict(decoded_token), True)
 
     def get_anonymous_claims(self) -> ClaimsIdentity:
         logger.debug("Returning anonymous claims identity.")
         return ClaimsIdentity({}, False, authentication_type="Anonymous")
 
+    def _get_claims_cache_key(self, token: str) -> bytes:
+        digest = self._claims_cache_digest.copy()
+        digest.update(token.encode())
+        return digest.digest()
+
+    def _cache_claims(self, cache_key: bytes, claims: dict) -> None:
+        ttl = self._CLAIMS_CACHE_TTL
+        if "exp" in claims:
+            ttl = min(ttl, float(claims["exp"]) - time.time())
+        now = time.monotonic()
+
+        # Dicts preserve insertion order, so expired entries form a prefix
+        # of the cache; sweep them in place and stop at the first live entry.
+        # Entries whose exp claim cut their lifetime short are dropped on lookup.
+        evict = []
+        for key, (_, entry_expires_at) in self._claims_cache.items():
+            if entry_expires_at > now:
+                break
+            evict.append(key)
+        for key in evict:
+            del self._claims_cache[key]
+
+        self._claims_cache.pop(cache_key, None)
+        self._claims_cache[cache_key] = (claims, now + ttl)
+        while len(self._claims_cache) > self._CLAIMS_CACHE_MAX:
+            del self._claims_cache[next(iter(self._claims_cache))]
+
     async def _get_public_key_or_secret(self, token: str) -> PyJWK:
-        header = get_unverified_header(token)
-        unverified_payload: dict = decode(token, options={"verify_signature": False})
+        # The token is fully verified by jwt.decode afterwards, so split it once
+        # here and only decode the unverified segments that are actually needed.
+        try:
+            header_segment, payload_segment, _ = token.split(".", 2)
+        except ValueError as e:
+            raise jwt.DecodeError("Not enough segments.") from e
 
-        jwksUri = (
-            "https://login.botframework.com/v1/.well-known/keys"
-            if unverified_payload.get("iss") == "https://api.botframework.com"
-            else f"https://login.microsoftonline.com/{self.configuration.TENANT_ID}/discovery/v2.0/keys"
-        )
-        jwks_client = PyJWKClient(jwksUri)
+        header = self._decode_segment(header_segment)
+        if not isinstance(header.get("kid"), str):
+            raise jwt.DecodeError("Key ID header parameter must be a string.")
+
+        jwks_uri = self._jwks_uri or self._select_jwks_uri(payload_segment)
+        return await self.get_key(jwks_uri, header["kid"])
+
+    def _select_jwks_uri(self, payload_segment: str) -> str:
+        issuer = self._decode_segment(payload_segment).get("iss")
+        # The payload is not verified yet, so iss may be any JSON value.
+        if not isinstance(issuer, str):
+            return self._tenant_jwks_uri
+        return self._issuer_to_jwks_uri.get(issuer, self._tenant_jwks_uri)
+
+    @staticmethod
+    def _decode_segment(segment: str) -> dict:
+        try:
+            decoded = json.loads(
+                base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+            )
+        except (binascii.Error, ValueError) as e:
+            raise jwt.DecodeError("Invalid token segment.") from e
+        if not isinstance(decoded, dict):
+            raise jwt.DecodeError("Invalid token segment.")
+        return decoded
+
+    async def get_key(self, jwks_uri: str, kid: str) -> PyJWK:
+        cache_key = (jwks_uri, kid)
+        entry = self._key_cache.get(cache_key)
+        if entry is not None:
+            age = time.monotonic() - entry[1]
+            if age < self._KEY_CACHE_TTL:
+                if (
+                    age > self._KEY_CACHE_TTL - self._KEY_REFRESH_AHEAD
+                    and cache_key not in self._refreshing
+                    and not self._refresh_backing_off(cache_key)
+                ):
+                    self._refreshing.add(cache_key)
+                    task = asyncio.create_task(self._refresh_key(jwks_uri, kid))
+                    self._refresh_tasks.add(task)
+                    task.add_done_callback(self._refresh_tasks.discard)
+                return entry[0]
+
+        async with self._lock:
+            # Another task may have fetched the key while we waited on the lock.
+            entry = self._key_cache.get(cache_key)
+            if entry is not None and time.monotonic() - entry[1] < self._KEY_CACHE_TTL:
+                return entry[0]
+
+            jwks_client = self._get_jwks_client(jwks_uri)
+            # Read PyJWKClient's JWK set cache directly when it holds the key.
+            # get_signing_key itself may block on the client's lock or fetch,
+            # so it only ever runs in a worker thread.
+            key = self._get_cached_signing_key(jwks_client, kid)
+            if key is None:
+                key = await asyncio.to_thread(jwks_client.get_signing_key, kid)
+            self._key_cache[cache_key] = (key, time.monotonic())
+            return key
+
+    async def _refresh_key(self, jwks_uri: str, kid: str) -> None:
+        cache_key = (jwks_uri, kid)
+        try:
+            jwks_client = self._get_jwks_client(jwks_uri)
+            jwk_set = await asyncio.to_thread(jwks_client.get_jwk_set, True)
+            key = self._find_signing_key(jwk_set, kid)
+            if key is not None:
+                self._key_cache[cache_key] = (key, time.monotonic())
+            else:
+                # The kid was rotated out; let the entry expire on its own.
+                logger.debug(f"Signing key {kid} no longer published by {jwks_uri}.")
+            self._refresh_failed_at.pop(cache_key, None)
+        except Exception as e:
+            logger.warning(f"Background refresh of signing key {kid} failed: {e}")
+            self._refresh_failed_at[cache_key] = time.monotonic()
+        finally:
+            self._refreshing.discard(cache_key)
+
+    def _refresh_backing_off(self, cache_key: tuple[str, str]) -> bool:
+        failed_at = self._refresh_failed_at.get(cache_key)
+        if failed_at is None:
+            return False
+        if time.monotonic() - failed_at < self._KEY_REFRESH_RETRY:
+            return True
+        del self._refresh_failed_at[cache_key]
+        return False
+
+    @staticmethod
+    def _find_signing_key(jwk_set: PyJWKSet, kid: str) -> Optional[PyJWK]:
+        # Mirrors PyJWKClient.get_signing_keys: only keys usable for signatures.
+        for jwk in jwk_set.keys:
+            if jwk.key_id == kid and jwk.public_key_use in ("sig", None):
+                return jwk
+        return None
 
-        key = await asyncio.to_thread(jwks_client.get_signing_key, header["kid"])
+    @classmethod
+    def _get_cached_signing_key(
+        cls, jwks_client: PyJWKClient, kid: str
+    ) -> Optional[PyJWK]:
+        if jwks_client.jwk_set_cache is None:
+            return None
+        jwk_set = jwks_client.jwk_set_cache.get()
+        if jwk_set is None:
+            return None
+        return cls._find_signing_key(jwk_set, kid)
 
-        return key
+    @classmethod
+    def _get_jwks_client(cls, jwks_uri: str) -> PyJWKClient:
+        jwks_client = cls._jwks_clients.get(jwks_uri)
+        if jwks_client is None:
+            # Signing keys are cached, with expiry, by the validators; the
+            # client only caches the JWK set, so that removed kids stop
+            # resolving once that expires.
+            jwks_client = cls._jwks_clients.setdefault(
+                jwks_uri, PyJWKClient(jwks_uri, lifespan=3600)
+            )
+        return jwks_client
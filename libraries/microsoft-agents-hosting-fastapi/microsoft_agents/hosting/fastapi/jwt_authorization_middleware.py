@@ -36,7 +36,7 @@ class JwtAuthorizationMiddleware:
         )
 
         request = Request(scope, receive=receive)
-        token_validator = JwtTokenValidator(auth_config)
+        token_validator = JwtTokenValidator.for_configuration(auth_config)
         auth_header = request.headers.get("Authorization")
 
         if auth_header:
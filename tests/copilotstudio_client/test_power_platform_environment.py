@@ -0,0 +1,147 @@
+import pytest
+
+from microsoft_agents.copilotstudio.client import (
+    AgentType,
+    ConnectionSettings,
+    PowerPlatformCloud,
+    PowerPlatformEnvironment,
+)
+
+ENVIRONMENT_ID = "8e33a2ef-2a7a-4a5c-9c5b-8c0f0b0a1c2d"
+AGENT_IDENTIFIER = "bot"
+QUERY = "?api-version=2022-03-01-preview"
+
+
+def create_settings(
+    cloud=None, copilot_agent_type=None, custom_power_platform_cloud=None
+):
+    return ConnectionSettings(
+        ENVIRONMENT_ID,
+        AGENT_IDENTIFIER,
+        cloud,
+        copilot_agent_type,
+        custom_power_platform_cloud,
+    )
+
+
+@pytest.fixture(autouse=True)
+def connection_url_cache():
+    cache = PowerPlatformEnvironment._get_copilot_studio_connection_url
+    cache.cache_clear()
+    yield cache
+    cache.cache_clear()
+
+
+class TestPowerPlatformEnvironment:
+    @pytest.mark.parametrize(
+        "settings, kwargs, expected",
+        [
+            (
+                create_settings(PowerPlatformCloud.PROD),
+                {"conversation_id": "c1"},
+                "https://8e33a2ef2a7a4a5c9c5b8c0f0b0a1c.2d.environment.api.powerplatform.com"
+                "/copilotstudio/dataverse-backed/authenticated/bots/bot/conversations/c1",
+            ),
+            (
+                create_settings(PowerPlatformCloud.GOV, AgentType.PREBUILT),
+                {},
+                "https://8e33a2ef2a7a4a5c9c5b8c0f0b0a1c2.d.environment.api.gov.powerplatform.microsoft.us"
+                "/copilotstudio/prebuilt/authenticated/bots/bot/conversations",
+            ),
+            (
+                create_settings(PowerPlatformCloud.UNKNOWN),
+                {"cloud": PowerPlatformCloud.DEV, "agent_type": AgentType.PREBUILT},
+                "https://8e33a2ef2a7a4a5c9c5b8c0f0b0a1c2.d.environment.api.dev.powerplatform.com"
+                "/copilotstudio/dataverse-backed/authenticated/bots/bot/conversations",
+            ),
+            (
+                create_settings(PowerPlatformCloud.LOCAL),
+                {"conversation_id": "c2"},
+                "https://8e33a2ef2a7a4a5c9c5b8c0f0b0a1c2.d.environment.api.powerplatform.localhost"
+                "/copilotstudio/dataverse-backed/authenticated/bots/bot/conversations/c2",
+            ),
+            (
+                create_settings(
+                    PowerPlatformCloud.OTHER,
+                    custom_power_platform_cloud="api.custom.example.com",
+                ),
+                {"conversation_id": "c3"},
+                "https://8e33a2ef2a7a4a5c9c5b8c0f0b0a1c2.d.environment.api.custom.example.com"
+                "/copilotstudio/dataverse-backed/authenticated/bots/bot/conversations/c3",
+            ),
+            (
+                create_settings(
+                    PowerPlatformCloud.UNKNOWN,
+                    custom_power_platform_cloud="api.custom.example.com",
+                ),
+                {
+                    "cloud": PowerPlatformCloud.OTHER,
+                    "cloud_base_address": "api.base.example.com",
+                },
+                "https://8e33a2ef2a7a4a5c9c5b8c0f0b0a1c2.d.environment.api.custom.example.com"
+                "/copilotstudio/dataverse-backed/authenticated/bots/bot/conversations",
+            ),
+        ],
+    )
+    def test_get_copilot_studio_connection_url(
+        self, connection_url_cache, settings, kwargs, expected
+    ):
+        url = PowerPlatformEnvironment.get_copilot_studio_connection_url(
+            settings, **kwargs
+        )
+        assert url == expected + QUERY
+        assert connection_url_cache.cache_info().misses == 1
+
+        assert (
+            PowerPlatformEnvironment.get_copilot_studio_connection_url(
+                settings, **kwargs
+            )
+            == url
+        )
+        # Equal settings in another instance share the cached URL.
+        copy = create_settings(
+            settings.cloud,
+            settings.copilot_agent_type,
+            settings.custom_power_platform_cloud,
+        )
+        assert (
+            PowerPlatformEnvironment.get_copilot_studio_connection_url(copy, **kwargs)
+            == url
+        )
+        cache_info = connection_url_cache.cache_info()
+        assert (cache_info.hits, cache_info.misses) == (2, 1)
+
+    def test_conversation_id_is_part_of_cache_key(self, connection_url_cache):
+        settings = create_settings()
+        for conversation_id in ("c1", "c2"):
+            url = PowerPlatformEnvironment.get_copilot_studio_connection_url(
+                settings, conversation_id
+            )
+            assert url.endswith(f"/conversations/{conversation_id}{QUERY}")
+        assert connection_url_cache.cache_info().misses == 2
+
+    @pytest.mark.parametrize(
+        "settings, kwargs, message",
+        [
+            (
+                create_settings(PowerPlatformCloud.OTHER),
+                {},
+                "Either CustomPowerPlatformCloud or cloud_base_address must be provided",
+            ),
+            (
+                create_settings(PowerPlatformCloud.PROD),
+                {"cloud": PowerPlatformCloud.OTHER},
+                "cloud_base_address must be provided",
+            ),
+        ],
+    )
+    def test_get_copilot_studio_connection_url_errors_not_cached(
+        self, connection_url_cache, settings, kwargs, message
+    ):
+        for _ in range(2):
+            with pytest.raises(ValueError, match=message):
+                PowerPlatformEnvironment.get_copilot_studio_connection_url(
+                    settings, **kwargs
+                )
+        cache_info = connection_url_cache.cache_info()
+        assert (cache_info.hits, cache_info.misses, cache_info.currsize) == (0, 2, 0)
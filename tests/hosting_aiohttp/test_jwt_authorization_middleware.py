@@ -0,0 +1,79 @@
+import pytest
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from microsoft_agents.hosting.core import (
+    AgentAuthConfiguration,
+    ClaimsIdentity,
+    JwtTokenValidator,
+)
+from microsoft_agents.hosting.aiohttp import (
+    jwt_authorization_decorator,
+    jwt_authorization_middleware,
+)
+
+
+@pytest.fixture
+def validators(mocker):
+    validators = []
+
+    async def validate_token(self, token):
+        validators.append(self)
+        return ClaimsIdentity({"aud": self.configuration.CLIENT_ID}, True)
+
+    mocker.patch.object(
+        JwtTokenValidator, "validate_token", autospec=True, side_effect=validate_token
+    )
+    return validators
+
+
+async def handler(request: web.Request):
+    return web.json_response(request["claims_identity"].claims)
+
+
+def create_app(**kwargs) -> web.Application:
+    app = web.Application(**kwargs)
+    app["agent_configuration"] = AgentAuthConfiguration(client_id="test-client-id")
+    return app
+
+
+async def send_requests(app: web.Application, count: int):
+    async with TestClient(TestServer(app)) as client:
+        for _ in range(count):
+            response = await client.get("/", headers={"Authorization": "Bearer token"})
+            assert response.status == 200
+            assert await response.json() == {"aud": "test-client-id"}
+
+
+@pytest.mark.filterwarnings("ignore::aiohttp.web_exceptions.NotAppKeyWarning")
+class TestJwtAuthorizationMiddleware:
+    @pytest.mark.asyncio
+    async def test_middleware_reuses_validator(self, validators):
+        app = create_app(middlewares=[jwt_authorization_middleware])
+        app.router.add_get("/", handler)
+
+        await send_requests(app, 2)
+
+        assert len(validators) == 2
+        assert validators[0] is validators[1]
+
+    @pytest.mark.asyncio
+    async def test_decorator_reuses_validator(self, validators):
+        app = create_app()
+        app.router.add_get("/", jwt_authorization_decorator(handler))
+
+        await send_requests(app, 2)
+
+        assert len(validators) == 2
+        assert validators[0] is validators[1]
+
+    @pytest.mark.asyncio
+    async def test_validator_per_configuration(self, validators):
+        apps = [create_app(middlewares=[jwt_authorization_middleware]) for _ in "ab"]
+        for app in apps:
+            app.router.add_get("/", handler)
+            await send_requests(app, 1)
+
+        assert len(validators) == 2
+        assert validators[0] is not validators[1]
@@ -66,6 +66,21 @@ class TestAuthorizationConfiguration:
                 f"https://login.microsoftonline.com/test-tenant-id-{name}/v2.0",
             ]
 
+    def test_issuer_to_jwks_uri(self):
+        issuer_to_jwks_uri = {"https://example.com": "https://example.com/keys"}
+        assert (
+            AgentAuthConfiguration(
+                issuer_to_jwks_uri=issuer_to_jwks_uri
+            ).ISSUER_TO_JWKS_URI
+            == issuer_to_jwks_uri
+        )
+        assert (
+            AgentAuthConfiguration(
+                ISSUERTOJWKSURI=issuer_to_jwks_uri
+            ).ISSUER_TO_JWKS_URI
+            == issuer_to_jwks_uri
+        )
+
     def test_empty_settings(self):
         auth_config = AgentAuthConfiguration()
         assert auth_config.AUTH_TYPE == AuthTypes.client_secret
@@ -77,3 +92,4 @@ class TestAuthorizationConfiguration:
         assert auth_config.CONNECTION_NAME == None
         assert auth_config.AUTHORITY == None
         assert auth_config.SCOPES == None
+        assert auth_config.ISSUER_TO_JWKS_URI == None
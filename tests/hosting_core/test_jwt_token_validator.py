@@ -0,0 +1,516 @@
+import asyncio
+import gc
+import json
+import weakref
+
+import jwt
+import pytest
+
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt import PyJWK, PyJWKSet
+from jwt.algorithms import RSAAlgorithm
+
+from microsoft_agents.hosting.core import AgentAuthConfiguration, JwtTokenValidator
+from microsoft_agents.hosting.core.authorization import jwt_token_validator
+
+CLIENT_ID = "test-client-id"
+TENANT_ID = "test-tenant-id"
+KID = "test-kid"
+
+BOT_FRAMEWORK_JWKS_URI = "https://login.botframework.com/v1/.well-known/keys"
+TENANT_JWKS_URI = f"https://login.microsoftonline.com/{TENANT_ID}/discovery/v2.0/keys"
+
+
+@pytest.fixture(scope="module")
+def private_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+@pytest.fixture
+def jwk_data(private_key):
+    jwk = RSAAlgorithm.to_jwk(private_key.public_key(), as_dict=True)
+    return {**jwk, "kid": KID, "alg": "RS256"}
+
+
+@pytest.fixture
+def signing_key(jwk_data):
+    return PyJWK(jwk_data)
+
+
+@pytest.fixture(autouse=True)
+def jwks_client_cls(mocker, signing_key):
+    JwtTokenValidator._jwks_clients.clear()
+    jwks_client_cls = mocker.patch.object(jwt_token_validator, "PyJWKClient")
+    jwks_client_cls.return_value.get_signing_key.return_value = signing_key
+    yield jwks_client_cls
+    JwtTokenValidator._jwks_clients.clear()
+
+
+@pytest.fixture
+def validator():
+    return JwtTokenValidator(
+        AgentAuthConfiguration(client_id=CLIENT_ID, tenant_id=TENANT_ID)
+    )
+
+
+def create_token(private_key, iss="https://api.botframework.com", aud=CLIENT_ID):
+    return jwt.encode(
+        {"iss": iss, "aud": aud},
+        private_key,
+        algorithm="RS256",
+        headers={"kid": KID},
+    )
+
+
+class TestJwtTokenValidator:
+
+    @pytest.mark.asyncio
+    async def test_validate_token(self, validator, private_key):
+        token = create_token(private_key)
+        claims = await validator.validate_token(token)
+        assert claims.is_authenticated
+        assert claims.claims["aud"] == CLIENT_ID
+
+    @pytest.mark.asyncio
+    async def test_validate_token_invalid_audience(self, validator, private_key):
+        token = create_token(private_key, aud="other-client-id")
+        with pytest.raises(ValueError):
+            await validator.validate_token(token)
+
+    def test_for_configuration_reuses_validator(self):
+        configuration = AgentAuthConfiguration(client_id=CLIENT_ID, tenant_id=TENANT_ID)
+        validator = JwtTokenValidator.for_configuration(configuration)
+        assert JwtTokenValidator.for_configuration(configuration) is validator
+        assert validator._client_id == CLIENT_ID
+
+        other = AgentAuthConfiguration(client_id=CLIENT_ID, tenant_id=TENANT_ID)
+        assert JwtTokenValidator.for_configuration(other) is not validator
+
+    def test_for_configuration_releases_validator(self):
+        configuration = AgentAuthConfiguration(client_id=CLIENT_ID, tenant_id=TENANT_ID)
+        JwtTokenValidator.for_configuration(configuration)
+        assert configuration in JwtTokenValidator._validators
+
+        # The cached validator must not keep its configuration alive.
+        ref = weakref.ref(configuration)
+        del configuration
+        gc.collect()
+        assert ref() is None
+
+    def test_for_configuration_without_configuration(self):
+        validator = JwtTokenValidator.for_configuration(None)
+        assert validator is not JwtTokenValidator.for_configuration(None)
+        assert not validator.get_anonymous_claims().is_authenticated
+
+    @pytest.mark.asyncio
+    async def test_validate_token_invalid_audience_logged(
+        self, caplog, validator, private_key
+    ):
+        token = create_token(private_key, aud="other-client-id")
+        with pytest.raises(ValueError):
+            await validator.validate_token(token)
+        assert "Invalid audience: other-client-id" in caplog.text
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("client_id", [CLIENT_ID, None])
+    async def test_validate_token_missing_audience(self, private_key, client_id):
+        validator = JwtTokenValidator(
+            AgentAuthConfiguration(client_id=client_id, tenant_id=TENANT_ID)
+        )
+        token = jwt.encode(
+            {"iss": "https://api.botframework.com"},
+            private_key,
+            algorithm="RS256",
+            headers={"kid": KID},
+        )
+        with pytest.raises(ValueError, match="Invalid audience."):
+            await validator.validate_token(token)
+
+    @pytest.mark.asyncio
+    async def test_validate_token_without_client_id(self, private_key):
+        validator = JwtTokenValidator(AgentAuthConfiguration(tenant_id=TENANT_ID))
+        with pytest.raises(ValueError, match="Invalid audience."):
+            await validator.validate_token(create_token(private_key))
+
+    def test_get_anonymous_claims_without_configuration(self):
+        claims = JwtTokenValidator(None).get_anonymous_claims()
+        assert not claims.is_authenticated
+
+    @pytest.mark.asyncio
+    async def test_validate_token_audience_list(self, validator, private_key):
+        token = create_token(private_key, aud=["other-client-id", CLIENT_ID])
+        claims = await validator.validate_token(token)
+        assert claims.is_authenticated
+
+    @pytest.mark.asyncio
+    async def test_jwks_client_reused_across_validators(
+        self, validator, private_key, jwks_client_cls
+    ):
+        token = create_token(private_key)
+        await validator.validate_token(token)
+        await JwtTokenValidator(validator.configuration).validate_token(token)
+        jwks_client_cls.assert_called_once()
+        assert jwks_client_cls.call_args.args == (BOT_FRAMEWORK_JWKS_URI,)
+
+    @pytest.mark.asyncio
+    async def test_jwks_client_per_uri(self, validator, private_key, jwks_client_cls):
+        await validator.validate_token(create_token(private_key))
+        await validator.validate_token(
+            create_token(private_key, iss=f"https://sts.windows.net/{TENANT_ID}/")
+        )
+        assert [call.args[0] for call in jwks_client_cls.call_args_list] == [
+            BOT_FRAMEWORK_JWKS_URI,
+            TENANT_JWKS_URI,
+        ]
+
+    @pytest.mark.asyncio
+    async def test_validate_token_uses_claims_cache(
+        self, validator, private_key, jwks_client_cls
+    ):
+        token = create_token(private_key)
+        first = await validator.validate_token(token)
+        second = await validator.validate_token(token)
+        assert first.claims == second.claims
+        get_signing_key = jwks_client_cls.return_value.get_signing_key
+        assert get_signing_key.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_claims_cache_skips_invalid_audience(self, validator, private_key):
+        token = create_token(private_key, aud="other-client-id")
+        with pytest.raises(ValueError):
+            await validator.validate_token(token)
+        with pytest.raises(ValueError):
+            await validator.validate_token(token)
+        assert not validator._claims_cache
+
+    @pytest.mark.asyncio
+    async def test_claims_cache_scoped_to_audience(self, validator, private_key):
+        token = create_token(private_key)
+        await validator.validate_token(token)
+        other_validator = JwtTokenValidator(
+            AgentAuthConfiguration(client_id="other-client-id", tenant_id=TENANT_ID)
+        )
+        with pytest.raises(ValueError):
+            await other_validator.validate_token(token)
+
+    @pytest.mark.asyncio
+    async def test_claims_cache_expires(self, mocker, validator, private_key):
+        decode = mocker.spy(jwt_token_validator.jwt, "decode")
+        token = create_token(private_key)
+        await validator.validate_token(token)
+        now = jwt_token_validator.time.monotonic()
+        mocker.patch.object(
+            jwt_token_validator.time,
+            "monotonic",
+            return_value=now + JwtTokenValidator._CLAIMS_CACHE_TTL + 1,
+        )
+        await validator.validate_token(token)
+        assert decode.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_claims_cache_bounded(self, mocker, validator, private_key):
+        mocker.patch.object(JwtTokenValidator, "_CLAIMS_CACHE_MAX", 2)
+        tokens = [create_token(private_key, iss=f"issuer-{i}") for i in range(3)]
+        for token in tokens:
+            await validator.validate_token(token)
+        assert len(validator._claims_cache) == 2
+        assert validator._get_claims_cache_key(tokens[0]) not in (
+            validator._claims_cache
+        )
+
+    @pytest.mark.asyncio
+    async def test_get_key_uses_key_cache(
+        self, validator, private_key, jwks_client_cls
+    ):
+        await validator.validate_token(create_token(private_key, iss="issuer-1"))
+        await validator.validate_token(create_token(private_key, iss="issuer-2"))
+        get_signing_key = jwks_client_cls.return_value.get_signing_key
+        get_signing_key.assert_called_once_with(KID)
+
+    @pytest.mark.asyncio
+    async def test_get_key_refetches_expired_key(
+        self, validator, mocker, signing_key, jwks_client_cls
+    ):
+        assert await validator.get_key(TENANT_JWKS_URI, KID) is signing_key
+        now = jwt_token_validator.time.monotonic()
+        mocker.patch.object(
+            jwt_token_validator.time,
+            "monotonic",
+            return_value=now + JwtTokenValidator._KEY_CACHE_TTL + 1,
+        )
+        assert await validator.get_key(TENANT_JWKS_URI, KID) is signing_key
+        get_signing_key = jwks_client_cls.return_value.get_signing_key
+        assert get_signing_key.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_claims_cache_honors_exp(self, mocker, validator, private_key):
+        decode = mocker.spy(jwt_token_validator.jwt, "decode")
+        exp = int(jwt_token_validator.time.time()) - 1
+        token = jwt.encode(
+            {"iss": "https://api.botframework.com", "aud": CLIENT_ID, "exp": exp},
+            private_key,
+            algorithm="RS256",
+            headers={"kid": KID},
+        )
+        await validator.validate_token(token)
+        await validator.validate_token(token)
+        assert decode.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_claims_cache_sweeps_expired_entries(
+        self, mocker, validator, private_key
+    ):
+        stale_token = create_token(private_key, iss="issuer-1")
+        await validator.validate_token(stale_token)
+        now = jwt_token_validator.time.monotonic()
+        mocker.patch.object(
+            jwt_token_validator.time,
+            "monotonic",
+            return_value=now + JwtTokenValidator._CLAIMS_CACHE_TTL + 1,
+        )
+        fresh_token = create_token(private_key, iss="issuer-2")
+        await validator.validate_token(fresh_token)
+        assert list(validator._claims_cache) == [
+            validator._get_claims_cache_key(fresh_token)
+        ]
+
+    @pytest.mark.asyncio
+    async def test_get_key_fetches_uncached_key_in_thread(
+        self, validator, mocker, signing_key, jwks_client_cls
+    ):
+        jwks_client_cls.return_value.jwk_set_cache.get.return_value = None
+        to_thread = mocker.spy(jwt_token_validator.asyncio, "to_thread")
+        assert await validator.get_key(TENANT_JWKS_URI, KID) is signing_key
+        to_thread.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_get_key_skips_thread_for_cached_jwk_set(
+        self, validator, mocker, jwk_data, signing_key, jwks_client_cls
+    ):
+        jwks_client_cls.return_value.jwk_set_cache.get.return_value = PyJWKSet(
+            [jwk_data]
+        )
+        to_thread = mocker.spy(jwt_token_validator.asyncio, "to_thread")
+        key = await validator.get_key(TENANT_JWKS_URI, KID)
+        assert key.key_id == KID
+        to_thread.assert_not_called()
+        jwks_client_cls.return_value.get_signing_key.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_get_key_ignores_cached_non_signing_key(
+        self, validator, mocker, jwk_data, signing_key, jwks_client_cls
+    ):
+        jwks_client_cls.return_value.jwk_set_cache.get.return_value = PyJWKSet(
+            [{**jwk_data, "use": "enc"}]
+        )
+        to_thread = mocker.spy(jwt_token_validator.asyncio, "to_thread")
+        assert await validator.get_key(TENANT_JWKS_URI, KID) is signing_key
+        to_thread.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_single_configured_issuer_skips_payload_decode(
+        self, mocker, private_key, jwks_client_cls
+    ):
+        jwks_uri = "https://example.com/keys"
+        validator = JwtTokenValidator(
+            AgentAuthConfiguration(
+                client_id=CLIENT_ID,
+                tenant_id=TENANT_ID,
+                issuer_to_jwks_uri={"https://example.com": jwks_uri},
+            )
+        )
+        decode_segment = mocker.spy(JwtTokenValidator, "_decode_segment")
+        await validator.validate_token(create_token(private_key))
+        decode_segment.assert_called_once()
+        assert jwks_client_cls.call_args.args == (jwks_uri,)
+
+    @pytest.mark.asyncio
+    async def test_configured_issuers_select_jwks_uri(
+        self, private_key, jwks_client_cls
+    ):
+        validator = JwtTokenValidator(
+            AgentAuthConfiguration(
+                client_id=CLIENT_ID,
+                tenant_id=TENANT_ID,
+                issuer_to_jwks_uri={
+                    "https://issuer-1.com": "https://issuer-1.com/keys",
+                    "https://issuer-2.com": "https://issuer-2.com/keys",
+                },
+            )
+        )
+        await validator.validate_token(
+            create_token(private_key, iss="https://issuer-2.com")
+        )
+        await validator.validate_token(
+            create_token(private_key, iss="https://unknown.com")
+        )
+        assert [call.args[0] for call in jwks_client_cls.call_args_list] == [
+            "https://issuer-2.com/keys",
+            TENANT_JWKS_URI,
+        ]
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        "token",
+        [
+            "not-a-token",
+            "e30.e30",
+            "!!!.e30.signature",
+            "WyJraWQiXQ.e30.signature",
+            "e30.e30.signature",
+            "eyJraWQiOlsiYSJdfQ.e30.signature",
+        ],
+    )
+    async def test_validate_token_malformed(self, validator, token):
+        with pytest.raises(jwt.DecodeError):
+            await validator.validate_token(token)
+
+    @pytest.mark.asyncio
+    async def test_get_key_refreshes_ahead_of_expiry(
+        self, validator, mocker, jwk_data, signing_key, jwks_client_cls
+    ):
+        assert await validator.get_key(TENANT_JWKS_URI, KID) is signing_key
+        get_jwk_set = jwks_client_cls.return_value.get_jwk_set
+        get_jwk_set.return_value = PyJWKSet([jwk_data])
+
+        now = jwt_token_validator.time.monotonic()
+        mocker.patch.object(
+            jwt_token_validator.time,
+            "monotonic",
+            return_value=now
+            + JwtTokenValidator._KEY_CACHE_TTL
+            - JwtTokenValidator._KEY_REFRESH_AHEAD / 2,
+        )
+        assert await validator.get_key(TENANT_JWKS_URI, KID) is signing_key
+        assert await validator.get_key(TENANT_JWKS_URI, KID) is signing_key
+        await asyncio.gather(*validator._refresh_tasks)
+
+        get_jwk_set.assert_called_once_with(True)
+        jwks_client_cls.return_value.get_signing_key.assert_called_once_with(KID)
+        refreshed_key, refreshed_at = validator._key_cache[(TENANT_JWKS_URI, KID)]
+        assert refreshed_key.key_id == KID
+        assert refreshed_at == jwt_token_validator.time.monotonic()
+        assert not validator._refreshing
+
+    @pytest.mark.asyncio
+    async def test_get_key_backs_off_after_failed_refresh(
+        self, validator, mocker, signing_key, jwks_client_cls
+    ):
+        assert await validator.get_key(TENANT_JWKS_URI, KID) is signing_key
+        get_jwk_set = jwks_client_cls.return_value.get_jwk_set
+        get_jwk_set.side_effect = jwt.PyJWKClientConnectionError("unreachable")
+
+        now = jwt_token_validator.time.monotonic()
+        refresh_at = (
+            now
+            + JwtTokenValidator._KEY_CACHE_TTL
+            - JwtTokenValidator._KEY_REFRESH_AHEAD
+        )
+        monotonic = mocker.patch.object(
+            jwt_token_validator.time, "monotonic", return_value=refresh_at
+        )
+        assert await validator.get_key(TENANT_JWKS_URI, KID) is signing_key
+        await asyncio.gather(*validator._refresh_tasks)
+        assert get_jwk_set.call_count == 1
+        assert not validator._refreshing
+
+        # Within the retry delay the stale key is served without refreshing.
+        monotonic.return_value = refresh_at + JwtTokenValidator._KEY_REFRESH_RETRY / 2
+        assert await validator.get_key(TENANT_JWKS_URI, KID) is signing_key
+        assert not validator._refresh_tasks
+        assert get_jwk_set.call_count == 1
+
+        monotonic.return_value = refresh_at + JwtTokenValidator._KEY_REFRESH_RETRY
+        assert await validator.get_key(TENANT_JWKS_URI, KID) is signing_key
+        await asyncio.gather(*validator._refresh_tasks)
+        assert get_jwk_set.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_get_key_stops_resolving_removed_kid(
+        self, validator, mocker, jwk_data
+    ):
+        mocker.patch.object(jwt_token_validator, "PyJWKClient", jwt.PyJWKClient)
+        fetch_data = mocker.patch.object(
+            jwt.PyJWKClient, "fetch_data", return_value={"keys": [jwk_data]}
+        )
+        assert (await validator.get_key(TENANT_JWKS_URI, KID)).key_id == KID
+
+        # The kid is rotated out of the JWKS.
+        fetch_data.return_value = {"keys": [{**jwk_data, "kid": "rotated-kid"}]}
+        mocker.patch.object(
+            jwt_token_validator.time,
+            "monotonic",
+            return_value=jwt_token_validator.time.monotonic()
+            + JwtTokenValidator._KEY_CACHE_TTL
+            + 1,
+        )
+        with pytest.raises(jwt.PyJWKClientError):
+            await validator.get_key(TENANT_JWKS_URI, KID)
+
+    @pytest.mark.asyncio
+    async def test_rotated_out_kid_expires_after_refresh(
+        self, validator, mocker, private_key, jwk_data
+    ):
+        mocker.patch.object(jwt_token_validator, "PyJWKClient", jwt.PyJWKClient)
+        fetch_data = mocker.patch.object(
+            jwt.PyJWKClient, "fetch_data", return_value={"keys": [jwk_data]}
+        )
+        token = create_token(private_key)
+        await validator.validate_token(token)
+
+        fetch_data.return_value = {"keys": [{**jwk_data, "kid": "rotated-kid"}]}
+        now = jwt_token_validator.time.monotonic()
+        monotonic = mocker.patch.object(
+            jwt_token_validator.time,
+            "monotonic",
+            return_value=now
+            + JwtTokenValidator._KEY_CACHE_TTL
+            - JwtTokenValidator._KEY_REFRESH_AHEAD / 2,
+        )
+        # The background refresh no longer finds the kid, so the cached key is
+        # served until it expires but is not renewed.
+        assert (await validator.validate_token(token)).is_authenticated
+        await asyncio.gather(*validator._refresh_tasks)
+        assert fetch_data.call_count == 2
+
+        monotonic.return_value = now + JwtTokenValidator._KEY_CACHE_TTL + 1
+        with pytest.raises(jwt.PyJWKClientError):
+            await validator.validate_token(token)
+
+    @pytest.mark.asyncio
+    async def test_key_cache_bounded(self, validator, mocker, signing_key):
+        mocker.patch.object(validator._key_cache, "maxsize", 2)
+        await validator.get_key(TENANT_JWKS_URI, "kid-1")
+        await validator.get_key(TENANT_JWKS_URI, "kid-2")
+        await validator.get_key(TENANT_JWKS_URI, "kid-1")
+        await validator.get_key(TENANT_JWKS_URI, "kid-3")
+        assert list(validator._key_cache) == [
+            (TENANT_JWKS_URI, "kid-1"),
+            (TENANT_JWKS_URI, "kid-3"),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_caches_are_per_validator(self, validator, private_key):
+        token = create_token(private_key)
+        await validator.validate_token(token)
+        other_validator = JwtTokenValidator(validator.configuration)
+        assert validator._claims_cache
+        assert validator._key_cache
+        assert not other_validator._claims_cache
+        assert not other_validator._key_cache
+        assert validator._lock is not other_validator._lock
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("iss", [["https://api.botframework.com"], {}, 1])
+    async def test_non_string_issuer_uses_tenant_jwks_uri(
+        self, validator, private_key, jwks_client_cls, iss
+    ):
+        # jwt.encode rejects a non-string iss, so sign the raw payload.
+        token = jwt.api_jws.encode(
+            json.dumps({"iss": iss, "aud": CLIENT_ID}).encode(),
+            private_key,
+            algorithm="RS256",
+            headers={"kid": KID},
+        )
+        await validator._get_public_key_or_secret(token)
+        assert jwks_client_cls.call_args.args == (TENANT_JWKS_URI,)